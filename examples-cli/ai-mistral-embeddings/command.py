@@ -1,9 +1,80 @@
 #!/usr/bin/env python3
-import json
-import requests
+import functools
+import hashlib
+import mmap
+import orjson
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Shared HTTP/2 client: concurrent calls multiplex over one TLS connection
+# instead of opening one connection each, and the pool is reused across
+# calls. Transport retries cover transient connect failures.
+@functools.lru_cache(maxsize=1)
+def _client():
+    """Shared HTTP/2 client, created on first use so importing this module
+    (or just printing CLI usage) does not pay the httpx import cost."""
+    import httpx
+
+    return httpx.Client(
+        timeout=httpx.Timeout(60.0, connect=3.05),
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=32),
+        ),
+    )
+
+_EMBED_URL = "https://api.mistral.ai/v1/embeddings"
+
+
+# Endpoint and header constants: built once instead of re-allocating the
+# f-string and dict on every call in hot batching loops.
+@functools.lru_cache(maxsize=8)
+def _auth_headers(api_key):
+    """Headers for a given API key. Cached -- treat the returned dict as
+    frozen and copy before adding per-request headers."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+class _IterReader:
+    """Minimal file-like wrapper over an iterable of byte chunks. ijson
+    requires an object with read(n); handing it a plain generator such as
+    httpx's response.iter_bytes() makes it treat each chunk as a parse event
+    and blow up, so the stream goes through this adapter instead."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b""
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = [self._buf, *self._chunks]
+            self._buf = b""
+            return b"".join(parts)
+        while len(self._buf) < size:
+            try:
+                self._buf += next(self._chunks)
+            except StopIteration:
+                break
+        out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+
+# LRU cache of embeddings keyed by (model, text) so repeated lookups of the
+# same text skip the network round-trip entirely. Disable by setting
+# context["MISTRAL_EMBED_CACHE"] = False.
+_EMB_CACHE = OrderedDict()
+_EMB_CACHE_MAX = 4096
+
+
+def _emb_cache_key(model, input_text):
+    return hashlib.sha256(f"{model}\x00{input_text}".encode()).hexdigest()
+
+
 def ai_mistral_embeddings(args, context):
     """
     Generate embeddings using Mistral's API (v1) via REST requests.
@@ -13,6 +84,7 @@ def ai_mistral_embeddings(args, context):
 
     Optional context parameter:
         - MISTRAL_MODEL: override the embedding model (default: "mistral-embed")
+        - MISTRAL_EMBED_DTYPE: "fp16" to store float16 vectors (default: float32)
 
     Args:
         args (list): args[0] must be a string.
@@ -21,6 +93,10 @@ def ai_mistral_embeddings(args, context):
     Returns:
         int: 0 for success, -1 for failure
     """
+    import httpx
+    import ijson
+    import numpy as np
+
     set_name = context.get("set_context", "prev")
     error_key = f"{set_name}_error"
 
@@ -38,7 +114,16 @@ def ai_mistral_embeddings(args, context):
 
     # Model selection
     model = context.get("MISTRAL_MODEL", "mistral-embed")
-    endpoint = "https://api.mistral.ai/v1/embeddings"
+
+    # Cache lookup (only meaningful for single-string input)
+    use_cache = context.get("MISTRAL_EMBED_CACHE", True) and isinstance(input_text, str)
+    if use_cache:
+        cache_key = _emb_cache_key(model, input_text)
+        cached = _EMB_CACHE.get(cache_key)
+        if cached is not None:
+            _EMB_CACHE.move_to_end(cache_key)
+            context[set_name] = cached
+            return 0
 
     # Build payload (required fields only)
     payload = {
@@ -46,31 +131,43 @@ def ai_mistral_embeddings(args, context):
         "input": input_text
     }
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    headers = _auth_headers(api_key)
 
-    # Send request
+    # Send request (streamed so the body is parsed as it arrives instead of
+    # being buffered whole and parsed afterwards)
     try:
-        response = requests.post(endpoint, headers=headers, data=json.dumps(payload))
-    except requests.RequestException as e:
+        request = _client().build_request("POST", _EMBED_URL, headers=headers, content=orjson.dumps(payload))
+        response = _client().send(request, stream=True)
+    except httpx.HTTPError as e:
         context[error_key] = f"Request error: {e}"
         return -1
 
     # Check HTTP response
     if response.status_code != 200:
+        response.read()
+        response.close()
         context[error_key] = f"API returned HTTP {response.status_code}: {response.text}"
         return -1
 
-    # Parse response
+    # Parse response incrementally: each embedding is converted the moment
+    # its closing bracket arrives, so peak memory stays near one vector
     try:
-        decoded = response.json()
-        embeddings = [item.get("embedding") for item in decoded.get("data", [])]
+        # numpy arrays: a 1024-dim float32 vector is ~4 KB vs ~28 KB as a
+        # list of Python floats, and downstream similarity ops become BLAS
+        dtype = np.float16 if context.get("MISTRAL_EMBED_DTYPE") == "fp16" else np.float32
+        embeddings = [
+            np.asarray(embedding, dtype=dtype)
+            for embedding in ijson.items(_IterReader(response.iter_bytes()), "data.item.embedding")
+        ]
 
         # Return single embedding if original input was a string
         if len(embeddings) == 1 and isinstance(args[0], str):
             context[set_name] = embeddings[0]
+            if use_cache:
+                _EMB_CACHE[cache_key] = embeddings[0]
+                _EMB_CACHE.move_to_end(cache_key)
+                while len(_EMB_CACHE) > _EMB_CACHE_MAX:
+                    _EMB_CACHE.popitem(last=False)
         else:
             context[set_name] = embeddings
 
@@ -78,24 +175,154 @@ def ai_mistral_embeddings(args, context):
     except Exception as e:
         context[error_key] = f"Error parsing response: {e}"
         return -1
+    finally:
+        response.close()
+
+
+def ai_mistral_embeddings_many(args, context):
+    """
+    Batched variant of ai_mistral_embeddings for embedding many texts at once.
+
+    args[0] may be a list of strings (a single string is treated as a
+    one-element list). Texts are chunked into batches of
+    context["MISTRAL_BATCH"] (default: 64) -- the endpoint accepts a list in
+    "input" -- and batches are issued concurrently through the shared session
+    with up to context["MISTRAL_CONCURRENCY"] (default: 8) workers. The full
+    list of embeddings, in input order, is stored in context[set_context].
+
+    Args:
+        args (list): args[0] is a list of strings (or a single string).
+        context (dict): may contain 'set_context' and 'MISTRAL_API_KEY'.
+
+    Returns:
+        int: 0 for success, -1 for failure
+    """
+    import httpx
+    import ijson
+    import numpy as np
+
+    set_name = context.get("set_context", "prev")
+    error_key = f"{set_name}_error"
+
+    if not args or args[0] is None:
+        context[error_key] = "Usage: ai_mistral_embeddings_many <list of texts>"
+        return -1
+
+    api_key = context.get("MISTRAL_API_KEY")
+    if not api_key:
+        context[error_key] = "Error: MISTRAL_API_KEY not found in context."
+        return -1
+
+    texts = args[0] if isinstance(args[0], list) else [args[0]]
+    if not texts:
+        context[error_key] = "Usage: ai_mistral_embeddings_many <list of texts>"
+        return -1
+
+    model = context.get("MISTRAL_MODEL", "mistral-embed")
+    batch_size = context.get("MISTRAL_BATCH", 64)
+    max_workers = context.get("MISTRAL_CONCURRENCY", 8)
+    dtype = np.float16 if context.get("MISTRAL_EMBED_DTYPE") == "fp16" else np.float32
+
+    headers = _auth_headers(api_key)
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def _fetch(batch):
+        payload = {"model": model, "input": batch}
+        request = _client().build_request("POST", _EMBED_URL, headers=headers, content=orjson.dumps(payload))
+        response = _client().send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                response.read()
+                raise RuntimeError(f"API returned HTTP {response.status_code}: {response.text}")
+            return [
+                np.asarray(embedding, dtype=dtype)
+                for embedding in ijson.items(_IterReader(response.iter_bytes()), "data.item.embedding")
+            ]
+        finally:
+            response.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            # executor.map preserves batch order, so results line up with input
+            results = list(executor.map(_fetch, batches))
+    except (httpx.HTTPError, RuntimeError) as e:
+        context[error_key] = f"Request error: {e}"
+        return -1
+    except Exception as e:
+        context[error_key] = f"Error parsing response: {e}"
+        return -1
+
+    context[set_name] = [embedding for batch in results for embedding in batch]
+    return 0
+
+
+def dump_context_msgpack(context):
+    """
+    Serialize a context dict to MessagePack bytes for handoff to a downstream
+    process. numpy vectors are packed as raw bytes with dtype/shape preserved,
+    which is considerably smaller and faster to decode than JSON.
+    """
+    import msgpack
+    import numpy as np
+
+    def _default(obj):
+        if isinstance(obj, np.ndarray):
+            return {"__ndarray__": obj.tobytes(), "dtype": str(obj.dtype), "shape": list(obj.shape)}
+        raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+    return msgpack.packb(context, use_bin_type=True, default=_default)
+
+
+def load_context_msgpack(blob):
+    """Inverse of dump_context_msgpack: restore a context dict (and any numpy
+    vectors) from MessagePack bytes."""
+    import msgpack
+    import numpy as np
+
+    def _revive(obj):
+        if "__ndarray__" in obj:
+            return np.frombuffer(obj["__ndarray__"], dtype=obj["dtype"]).reshape(obj["shape"])
+        return obj
+
+    return msgpack.unpackb(blob, raw=False, object_hook=_revive)
 
 
 if __name__ == "__main__":
-    # Expect first argument to be the path to a JSON file containing args/context
-    if len(sys.argv) < 2:
-        print("Usage: python ai_mistral_embeddings.py <data.json>")
+    # Expect an argument with the path to a JSON (or, with --msgpack,
+    # MessagePack) file containing args/context
+    argv = sys.argv[1:]
+    use_msgpack = "--msgpack" in argv
+    if use_msgpack:
+        argv.remove("--msgpack")
+
+    if not argv:
+        print("Usage: python ai_mistral_embeddings.py [--msgpack] <data.json>")
         sys.exit(1)
 
-    data_file = Path(sys.argv[1])
+    data_file = Path(argv[0])
     if not data_file.exists():
         print(f"Error: JSON file '{data_file}' not found.")
         sys.exit(1)
 
-    # Load JSON file
-    with data_file.open("r", encoding="utf-8") as f:
+    # Load data file
+    if use_msgpack:
+        try:
+            data = load_context_msgpack(data_file.read_bytes())
+        except Exception as e:
+            print(f"Error parsing {data_file}: {e}")
+            sys.exit(1)
+    else:
+        # mmap + orjson: parse straight from the page cache, skipping the
+        # Python-level utf-8 decode of the whole file
         try:
-            data = json.load(f)
-        except json.JSONDecodeError as e:
+            with data_file.open("rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    data = orjson.loads(memoryview(mm))
+                finally:
+                    mm.close()
+        except ValueError as e:  # orjson.JSONDecodeError, empty-file mmap
             print(f"Error parsing {data_file}: {e}")
             sys.exit(1)
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Regression checks for the streaming embeddings parse path.
+
+Run with: python -m pytest examples-cli/ai-mistral-embeddings/test_command.py
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+# Load the command module by path (the directory name is not importable)
+_spec = importlib.util.spec_from_file_location(
+    "embeddings_command", Path(__file__).with_name("command.py")
+)
+command = importlib.util.module_from_spec(_spec)
+sys.modules["embeddings_command"] = command
+_spec.loader.exec_module(command)
+
+
+def test_iter_reader_reads_across_chunk_boundaries():
+    reader = command._IterReader(iter([b"abc", b"def", b"g"]))
+    assert reader.read(2) == b"ab"
+    assert reader.read(4) == b"cdef"
+    assert reader.read(10) == b"g"
+    assert reader.read(10) == b""
+
+
+def test_iter_reader_read_all():
+    reader = command._IterReader(iter([b"abc", b"def"]))
+    assert reader.read(1) == b"a"
+    assert reader.read() == b"bcdef"
+    assert reader.read() == b""
+
+
+def test_ijson_parses_embeddings_from_chunked_stream():
+    # The httpx migration regression: ijson must be fed a file-like object,
+    # not a raw bytes generator, or every parse fails with ValueError
+    ijson = pytest.importorskip("ijson")
+    body = (
+        b'{"object": "list", "data": ['
+        b'{"object": "embedding", "embedding": [0.1, 0.2, 0.3], "index": 0},'
+        b'{"object": "embedding", "embedding": [0.4, 0.5, 0.6], "index": 1}'
+        b'], "model": "mistral-embed"}'
+    )
+    # Tiny chunks so values straddle chunk boundaries like a real stream
+    chunks = (body[i:i + 7] for i in range(0, len(body), 7))
+    embeddings = [
+        [float(value) for value in embedding]
+        for embedding in ijson.items(command._IterReader(chunks), "data.item.embedding")
+    ]
+    assert embeddings == [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]
@@ -1,11 +1,26 @@
 #!/usr/bin/env python3
+import asyncio
+import functools
 import os
 import uuid
-import time
-import json
+import mmap
 import sys
-from mistralai import Mistral
-from mistralai.models import ToolFileChunk
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Client and executor are process-wide: Mistral() rebuilds an internal httpx
+# client and pydantic validators on every construction, and executor threads
+# only need to be started once.
+@functools.lru_cache(maxsize=4)
+def _mistral_client(api_key):
+    from mistralai import Mistral
+
+    return Mistral(api_key=api_key)
+
+
+_IMG_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
 
 def ai_mistral_image_gen(args, context):
     """
@@ -20,6 +35,10 @@ def ai_mistral_image_gen(args, context):
         - set_context: optional, default 'prev'
     :return: int (0 on success, 1 on error)
     """
+    # mistralai pulls in pydantic and httpx -- imported here so CLI start-up
+    # (usage message, bad input) does not pay several hundred ms of imports
+    from mistralai.models import ToolFileChunk
+
     set_name = context.get("set_context", "prev")
     error_key = f"{set_name}_error"
 
@@ -40,33 +59,36 @@ def ai_mistral_image_gen(args, context):
     model = context.get("MISTRAL_MODEL", "mistral-medium-2505")
     system_prompt = context.get("SYSTEM_PROMPT", "")
 
-    # Initialize client
-    client = Mistral(api_key=API_KEY)
-
-    # Create image generation agent
-    try:
-        image_agent = client.beta.agents.create(
-            model=model,
-            name="Image Generation Agent",
-            description="Agent used to generate images.",
-            instructions="Use the image generation tool when you have to create images.",
-            tools=[{"type": "image_generation"}],
-            completion_args={
-                "temperature": 0.3,
-                "top_p": 0.3
-            }
-        )
-    except Exception as e:
-        context[error_key] = f"Failed to create agent: {e}"
-        return 1
+    # Initialize client (cached per API key)
+    client = _mistral_client(API_KEY)
 
-    # Optional wait for agent readiness
-    time.sleep(2)
+    # Reuse a previously created agent when the caller shares context across
+    # calls -- agent creation is pure per-call overhead otherwise
+    agent_id = context.get("_MISTRAL_IMAGE_AGENT_ID")
+    if not agent_id:
+        try:
+            image_agent = client.beta.agents.create(
+                model=model,
+                name="Image Generation Agent",
+                description="Agent used to generate images.",
+                instructions="Use the image generation tool when you have to create images.",
+                tools=[{"type": "image_generation"}],
+                completion_args={
+                    "temperature": 0.3,
+                    "top_p": 0.3
+                }
+            )
+        except Exception as e:
+            context[error_key] = f"Failed to create agent: {e}"
+            return 1
+        agent_id = image_agent.id
+        context["_MISTRAL_IMAGE_AGENT_ID"] = agent_id
 
-    # Start conversation and generate image
+    # Start conversation and generate image (the create call above returns a
+    # usable agent, so there is no need to sleep before starting)
     try:
         response = client.beta.conversations.start(
-            agent_id=image_agent.id,
+            agent_id=agent_id,
             inputs=prompt
         )
     except Exception as e:
@@ -76,15 +98,35 @@ def ai_mistral_image_gen(args, context):
     saved_files = []
     uid = uuid.uuid4()
 
+    def _download_one(index, chunk):
+        """Download one generated file, streaming 64 KB blocks straight to
+        disk so the full image is never buffered in memory. Returns the saved
+        path, or None when the download came back empty."""
+        downloaded = client.files.download(file_id=chunk.file_id)
+        file_name = os.path.join(output_dir, f"{uid}_{index}.png")
+        written = 0
+        # buffering=0: each received block goes to the OS immediately, so
+        # disk write overlaps network receive
+        with open(file_name, "wb", buffering=0) as f:
+            for block in downloaded.iter_bytes(65536):
+                written += f.write(block)
+        if not written:
+            os.remove(file_name)
+            return None
+        return file_name
+
     try:
-        for i, chunk in enumerate(response.outputs[-1].content):
-            if isinstance(chunk, ToolFileChunk):
-                file_bytes = client.files.download(file_id=chunk.file_id).read()
-                if file_bytes:
-                    file_name = os.path.join(output_dir, f"{uid}_{i}.png")
-                    with open(file_name, "wb") as f:
-                        f.write(file_bytes)
-                    saved_files.append(file_name)
+        # Collect the file chunks first, then download them in parallel --
+        # each download is a blocking HTTP round-trip, so threads overlap them
+        chunks = [
+            (i, chunk)
+            for i, chunk in enumerate(response.outputs[-1].content)
+            if isinstance(chunk, ToolFileChunk)
+        ]
+        if chunks:
+            # _IMG_EXECUTOR.map preserves chunk order, so files stay in sequence
+            results = list(_IMG_EXECUTOR.map(lambda pair: _download_one(*pair), chunks))
+            saved_files = [name for name in results if name]
         if not saved_files:
             context[error_key] = "No images were generated."
             return 1
@@ -97,23 +139,151 @@ def ai_mistral_image_gen(args, context):
         return 1
 
 
+def ai_mistral_image_gen_many(args, context):
+    """
+    Async batched variant of ai_mistral_image_gen for several prompts at once.
+
+    :param args: list [prompts] where prompts is a list of strings (a single
+        string is treated as a one-element list)
+    :param context: same keys as ai_mistral_image_gen, plus:
+        - MISTRAL_IMAGE_CONCURRENCY: optional cap on in-flight prompts (default 4)
+    :return: int (0 on success, 1 on error)
+
+    Conversations and file downloads run concurrently through the SDK's
+    async methods, so N prompts overlap instead of paying N sequential
+    round-trips. context[set_context] holds the first saved path and
+    context[f"{set_name}_all"] the full list in prompt order.
+    """
+    from mistralai import Mistral
+    from mistralai.models import ToolFileChunk
+
+    set_name = context.get("set_context", "prev")
+    error_key = f"{set_name}_error"
+
+    if not args or not args[0]:
+        context[error_key] = "Usage: ai_mistral_image_gen_many <list of prompts>\nMissing prompts in args[0]"
+        return 1
+
+    prompts = args[0] if isinstance(args[0], list) else [args[0]]
+
+    API_KEY = context.get("MISTRAL_API_KEY")
+    if not API_KEY:
+        context[error_key] = "MISTRAL_API_KEY not set in context."
+        return 1
+
+    output_dir = context.get("output_dir", "output")
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = context.get("MISTRAL_MODEL", "mistral-medium-2505")
+
+    # A fresh client per invocation, NOT the cached one: each call runs its
+    # own asyncio.run loop, and the SDK's async connections stay pooled from
+    # the first loop -- reusing them after that loop closes fails with
+    # "RuntimeError: Event loop is closed"
+    client = Mistral(api_key=API_KEY)
+
+    # One shared agent for the whole batch (cached across calls, like the
+    # single-prompt path)
+    agent_id = context.get("_MISTRAL_IMAGE_AGENT_ID")
+    if not agent_id:
+        try:
+            image_agent = client.beta.agents.create(
+                model=model,
+                name="Image Generation Agent",
+                description="Agent used to generate images.",
+                instructions="Use the image generation tool when you have to create images.",
+                tools=[{"type": "image_generation"}],
+                completion_args={
+                    "temperature": 0.3,
+                    "top_p": 0.3
+                }
+            )
+        except Exception as e:
+            context[error_key] = f"Failed to create agent: {e}"
+            return 1
+        agent_id = image_agent.id
+        context["_MISTRAL_IMAGE_AGENT_ID"] = agent_id
+
+    semaphore = asyncio.Semaphore(context.get("MISTRAL_IMAGE_CONCURRENCY", 4))
+
+    async def _one(prompt):
+        async with semaphore:
+            response = await client.beta.conversations.start_async(
+                agent_id=agent_id,
+                inputs=prompt
+            )
+            uid = uuid.uuid4()
+            files = []
+            for i, chunk in enumerate(response.outputs[-1].content):
+                if isinstance(chunk, ToolFileChunk):
+                    downloaded = await client.files.download_async(file_id=chunk.file_id)
+                    file_name = os.path.join(output_dir, f"{uid}_{i}.png")
+                    written = 0
+                    with open(file_name, "wb", buffering=0) as f:
+                        async for block in downloaded.aiter_bytes(65536):
+                            written += f.write(block)
+                    if written:
+                        files.append(file_name)
+                    else:
+                        os.remove(file_name)
+            return files
+
+    try:
+        results = asyncio.run(_gather_all(_one, prompts))
+    except Exception as e:
+        context[error_key] = f"Image generation error: {e}"
+        return 1
+
+    saved_files = [name for files in results for name in files]
+    if not saved_files:
+        context[error_key] = "No images were generated."
+        return 1
+    context[set_name] = saved_files[0]
+    context[f"{set_name}_all"] = saved_files
+    return 0
+
+
+async def _gather_all(one, prompts):
+    return await asyncio.gather(*[one(prompt) for prompt in prompts])
+
+
 # ——————————————————————————
 # CLI / Demo
 # ——————————————————————————
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python ai_mistral_image_gen.py <data.json>")
+    argv = sys.argv[1:]
+    use_msgpack = "--msgpack" in argv
+    if use_msgpack:
+        argv.remove("--msgpack")
+
+    if not argv:
+        print("Usage: python ai_mistral_image_gen.py [--msgpack] <data.json>")
         sys.exit(1)
 
-    data_file = sys.argv[1]
+    data_file = argv[0]
     if not os.path.exists(data_file):
         print(f"Error: JSON file '{data_file}' not found.")
         sys.exit(1)
 
-    with open(data_file, "r", encoding="utf-8") as f:
+    if use_msgpack:
+        import msgpack
+        try:
+            with open(data_file, "rb") as f:
+                data = msgpack.unpackb(f.read(), raw=False)
+        except Exception as e:
+            print(f"Error parsing {data_file}: {e}")
+            sys.exit(1)
+    else:
+        # mmap + orjson: parse straight from the page cache, skipping the
+        # Python-level utf-8 decode of the whole file
         try:
-            data = json.load(f)
-        except json.JSONDecodeError as e:
+            with open(data_file, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    data = orjson.loads(memoryview(mm))
+                finally:
+                    mm.close()
+        except ValueError as e:  # orjson.JSONDecodeError, empty-file mmap
             print(f"Error parsing {data_file}: {e}")
             sys.exit(1)
 
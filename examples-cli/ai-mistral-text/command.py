@@ -1,9 +1,124 @@
 #!/usr/bin/env python3
-import json
-import requests
+import functools
+import gzip
+import io
+import mmap
+import orjson
 import sys
 from pathlib import Path
 
+# Shared HTTP/2 client: concurrent calls multiplex over one TLS connection
+# instead of opening one connection each, and the pool is reused across
+# calls. Transport retries cover transient connect failures.
+@functools.lru_cache(maxsize=1)
+def _client():
+    """Shared HTTP/2 client, created on first use so importing this module
+    (or just printing CLI usage) does not pay the httpx import cost."""
+    import httpx
+
+    return httpx.Client(
+        timeout=httpx.Timeout(60.0, connect=3.05),
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=32),
+        ),
+    )
+
+_CHAT_URL = "https://api.mistral.ai/v1/chat/completions"
+_EMBED_URL = "https://api.mistral.ai/v1/embeddings"
+
+
+# Endpoint and header constants: built once instead of re-allocating the
+# f-string and dict on every call in hot batching loops.
+@functools.lru_cache(maxsize=8)
+def _auth_headers(api_key):
+    """Headers for a given API key. Cached -- treat the returned dict as
+    frozen and copy before adding per-request headers."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+# Semantic cache: embeds each prompt and answers paraphrases of previously
+# seen prompts from disk instead of paying the full completion round-trip.
+# Enabled by setting context["SEMANTIC_CACHE_PATH"] to an .npz file path;
+# match threshold comes from context["SEMANTIC_THRESHOLD"] (default 0.95).
+_SEM_CACHES = {}
+
+
+def _sem_cache_load(path):
+    import numpy as np
+
+    cache = _SEM_CACHES.get(path)
+    if cache is None:
+        if Path(path).exists():
+            data = np.load(path, allow_pickle=True)
+            cache = {
+                "vectors": data["vectors"].astype(np.float32),
+                "prompts": list(data["prompts"]),
+                "responses": list(data["responses"]),
+            }
+        else:
+            cache = {"vectors": None, "prompts": [], "responses": []}
+        _SEM_CACHES[path] = cache
+    return cache
+
+
+def _sem_cache_embed(prompt, api_key):
+    """Embed a prompt for cache lookup. Returns None on any failure so the
+    chat call proceeds uncached rather than erroring out."""
+    import numpy as np
+
+    try:
+        response = _client().post(
+            _EMBED_URL,
+            headers=_auth_headers(api_key),
+            content=orjson.dumps({"model": "mistral-embed", "input": prompt}),
+        )
+        if response.status_code != 200:
+            return None
+        decoded = orjson.loads(response.content)
+        return np.asarray(decoded["data"][0]["embedding"], dtype=np.float32)
+    except Exception:
+        return None
+
+
+def _sem_cache_lookup(path, query_vec, threshold):
+    import numpy as np
+
+    cache = _sem_cache_load(path)
+    vectors = cache["vectors"]
+    if vectors is None or not len(cache["responses"]):
+        return None
+    sims = vectors @ query_vec / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vec) + 1e-12
+    )
+    best = int(np.argmax(sims))
+    if sims[best] >= threshold:
+        return cache["responses"][best]
+    return None
+
+
+def _sem_cache_store(path, query_vec, prompt, response_text):
+    import numpy as np
+
+    cache = _sem_cache_load(path)
+    row = query_vec.reshape(1, -1)
+    if cache["vectors"] is None:
+        cache["vectors"] = row
+    else:
+        cache["vectors"] = np.vstack([cache["vectors"], row])
+    cache["prompts"].append(prompt)
+    cache["responses"].append(response_text)
+    np.savez(
+        path,
+        vectors=cache["vectors"],
+        prompts=np.array(cache["prompts"], dtype=object),
+        responses=np.array(cache["responses"], dtype=object),
+    )
+
+
 def ai_mistral_text(args, context):
     """
     Generate text using Mistral Chat Completion with context and arguments.
@@ -12,6 +127,8 @@ def ai_mistral_text(args, context):
     :param context: dict containing API key, system prompt, and storage
     :return: int (0 on success, 1 on error)
     """
+    import httpx
+
     set_name = context.get("set_context", "prev")
     error_key = f"{set_name}_error"
 
@@ -29,6 +146,10 @@ def ai_mistral_text(args, context):
             "        - MISTRAL_MESSAGES: Optional fully custom message list.\n"
             "        - MISTRAL_TEMPERATURE: Optional float (0.0–2.0) for sampling randomness.\n"
             "        - MISTRAL_K: Optional int for top-k sampling.\n"
+            "        - SEMANTIC_CACHE_PATH: Optional .npz path enabling the semantic cache.\n"
+            "        - SEMANTIC_THRESHOLD: Optional cosine threshold for cache hits (default 0.95).\n"
+            "        - MISTRAL_STREAM: Optional bool to stream tokens as they arrive.\n"
+            "        - on_token: Optional callable invoked with each streamed text chunk.\n"
         )
         return 1
 
@@ -42,17 +163,29 @@ def ai_mistral_text(args, context):
     system_prompt = context.get('SYSTEM_PROMPT', '')
     model = context.get('MISTRAL_MODEL', "mistral-large-latest")
 
-    endpoint = "https://api.mistral.ai/v1/chat/completions"
+    # Semantic cache lookup: answer paraphrases of cached prompts locally
+    cache_path = context.get("SEMANTIC_CACHE_PATH")
+    query_vec = None
+    if cache_path:
+        query_vec = _sem_cache_embed(prompt, api_key)
+        if query_vec is not None:
+            hit = _sem_cache_lookup(
+                cache_path, query_vec, context.get("SEMANTIC_THRESHOLD", 0.95)
+            )
+            if hit is not None:
+                context[set_name] = hit
+                return 0
 
-    # Build messages
+    # Build messages without mutating the caller's MISTRAL_MESSAGES list:
+    # appending in place would grow the shared history by one duplicate user
+    # turn on every call that reuses the same context
     if 'MISTRAL_MESSAGES' in context:
-        messages = context['MISTRAL_MESSAGES'] 
+        messages = [*context['MISTRAL_MESSAGES'], {"role": "user", "content": prompt}]
     else:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
-
-    messages.append({"role": "user", "content": prompt})
+        messages.append({"role": "user", "content": prompt})
 
     payload = {
         "model": model,
@@ -66,14 +199,56 @@ def ai_mistral_text(args, context):
     if 'MISTRAL_K' in context:
         payload['k'] = context['MISTRAL_K']
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    stream = bool(context.get('MISTRAL_STREAM'))
+    if stream:
+        payload['stream'] = True
+
+    headers = _auth_headers(api_key)
+
+    body = orjson.dumps(payload)
+    # Compress large bodies (long histories, RAG-assembled prompts): level-1
+    # gzip is fast and typically shrinks chat text 3-5x, so the upload ends
+    # sooner on anything but a fast uplink
+    if len(body) > 2048:
+        body = gzip.compress(body, compresslevel=1, mtime=0)
+        headers = {**headers, "Content-Encoding": "gzip"}
+
+    # Streaming path: tokens surface the moment they arrive (via the
+    # optional on_token callback) instead of after the slowest token
+    if stream:
+        on_token = context.get('on_token')
+        buf = io.StringIO()
+        try:
+            with _client().stream("POST", _CHAT_URL, headers=headers, content=body) as response:
+                if response.status_code != 200:
+                    response.read()
+                    context[error_key] = f"API returned HTTP {response.status_code}: {response.text}"
+                    return 1
+                for line in response.iter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    frame = line[len("data: "):]
+                    if frame == "[DONE]":
+                        break
+                    delta = orjson.loads(frame).get('choices', [{}])[0].get('delta', {}).get('content')
+                    if delta:
+                        buf.write(delta)
+                        if on_token:
+                            on_token(delta)
+        except httpx.HTTPError as e:
+            context[error_key] = f"Request error: {e}"
+            return 1
+
+        context[set_name] = buf.getvalue()
+
+        if cache_path and query_vec is not None:
+            _sem_cache_store(cache_path, query_vec, prompt, context[set_name])
+
+        return 0
 
     try:
-        response = requests.post(endpoint, headers=headers, data=json.dumps(payload))
-    except requests.RequestException as e:
+        response = _client().post(_CHAT_URL, headers=headers, content=body)
+    except httpx.HTTPError as e:
         context[error_key] = f"Request error: {e}"
         return 1
 
@@ -81,25 +256,48 @@ def ai_mistral_text(args, context):
         context[error_key] = f"API returned HTTP {response.status_code}: {response.text}"
         return 1
 
-    decoded = response.json()
+    decoded = orjson.loads(response.content)
     context[set_name] = decoded.get('choices', [{}])[0].get('message', {}).get('content', '')
+
+    if cache_path and query_vec is not None:
+        _sem_cache_store(cache_path, query_vec, prompt, context[set_name])
+
     return 0
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python ai_mistral.py <data.json>")
+    argv = sys.argv[1:]
+    use_msgpack = "--msgpack" in argv
+    if use_msgpack:
+        argv.remove("--msgpack")
+
+    if not argv:
+        print("Usage: python ai_mistral.py [--msgpack] <data.json>")
         sys.exit(1)
 
-    data_file = Path(sys.argv[1])
+    data_file = Path(argv[0])
     if not data_file.exists():
         print(f"Error: JSON file '{data_file}' not found.")
         sys.exit(1)
 
-    with data_file.open("r", encoding="utf-8") as f:
+    if use_msgpack:
+        import msgpack
+        try:
+            data = msgpack.unpackb(data_file.read_bytes(), raw=False)
+        except Exception as e:
+            print(f"Error parsing {data_file}: {e}")
+            sys.exit(1)
+    else:
+        # mmap + orjson: parse straight from the page cache, skipping the
+        # Python-level utf-8 decode of the whole file
         try:
-            data = json.load(f)
-        except json.JSONDecodeError as e:
+            with data_file.open("rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    data = orjson.loads(memoryview(mm))
+                finally:
+                    mm.close()
+        except ValueError as e:  # orjson.JSONDecodeError, empty-file mmap
             print(f"Error parsing {data_file}: {e}")
             sys.exit(1)
 
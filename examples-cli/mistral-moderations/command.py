@@ -1,26 +1,156 @@
 #!/usr/bin/env python3
+import functools
+import hashlib
 import json
-import requests
+import mmap
+import orjson
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Shared HTTP/2 client: concurrent calls multiplex over one TLS connection
+# instead of opening one connection each, and the pool is reused across
+# calls. Transport retries cover transient connect failures.
+@functools.lru_cache(maxsize=1)
+def _client():
+    """Shared HTTP/2 client, created on first use so importing this module
+    (or just printing CLI usage) does not pay the httpx import cost."""
+    import httpx
+
+    return httpx.Client(
+        timeout=httpx.Timeout(60.0, connect=3.05),
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=32),
+        ),
+    )
+
+_MOD_URL = "https://api.mistral.ai/v1/moderations"
+
+
+# Endpoint and header constants: built once instead of re-allocating the
+# f-string and dict on every call in hot batching loops.
+@functools.lru_cache(maxsize=8)
+def _auth_headers(api_key):
+    """Headers for a given API key. Cached -- treat the returned dict as
+    frozen and copy before adding per-request headers."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+# Moderation output is deterministic per (model, text), so an exact-match
+# LRU cache avoids repeat round-trips when the same text is re-moderated.
+# Disable by setting context["MISTRAL_MOD_CACHE"] = False.
+_MOD_CACHE = OrderedDict()
+_MOD_CACHE_MAX = 4096
+
+
+def _mod_cache_key(model, input_text):
+    return hashlib.sha256(f"{model}\x00{input_text}".encode()).hexdigest()
+
+
+def _moderate_many(texts, model, api_key, context, set_name, error_key):
+    """
+    Moderate a list of texts using the endpoint's native batch input.
+
+    Cached results are reused, the remaining unique texts are sent in batches
+    of context["MISTRAL_MOD_BATCH"] (default: 128) with up to 4 concurrent
+    workers, and per-input results are stored as a list, in input order, in
+    context[set_name]. Returns 0 for success, -1 for failure.
+    """
+    import httpx
+
+    use_cache = context.get("MISTRAL_MOD_CACHE", True)
+    batch_size = context.get("MISTRAL_MOD_BATCH", 128)
+    headers = _auth_headers(api_key)
+
+    def item_key(text):
+        # Separate namespace from the scalar path, which caches the full
+        # API response rather than a per-input result
+        return _mod_cache_key(model, f"item\x00{text}")
+
+    # Deduplicate and answer what we can from the cache
+    pending = []
+    seen = set()
+    for text in texts:
+        if use_cache and item_key(text) in _MOD_CACHE:
+            continue
+        if text not in seen:
+            seen.add(text)
+            pending.append(text)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    def _fetch(batch):
+        payload = {"input": batch, "model": model}
+        response = _client().post(_MOD_URL, headers=headers, content=orjson.dumps(payload))
+        if response.status_code != 200:
+            raise RuntimeError(f"API returned HTTP {response.status_code}: {response.text}")
+        return orjson.loads(response.content).get("results", [])
+
+    fetched = {}
+    if batches:
+        try:
+            with ThreadPoolExecutor(max_workers=min(4, len(batches))) as executor:
+                for batch, batch_results in zip(batches, executor.map(_fetch, batches)):
+                    for text, result in zip(batch, batch_results):
+                        fetched[text] = result
+        except (httpx.HTTPError, RuntimeError) as e:
+            context[error_key] = f"Request failed: {e}"
+            return -1
+        except Exception as e:
+            context[error_key] = f"Error parsing response: {e}"
+            return -1
+
+    results = []
+    for text in texts:
+        key = item_key(text)
+        cached = _MOD_CACHE.get(key) if use_cache else None
+        if cached is not None:
+            _MOD_CACHE.move_to_end(key)
+            results.append(cached)
+            continue
+        result = fetched.get(text)
+        if result is None:
+            context[error_key] = f"No moderation result returned for input: {text!r}"
+            return -1
+        results.append(result)
+        if use_cache:
+            _MOD_CACHE[key] = result
+            _MOD_CACHE.move_to_end(key)
+            while len(_MOD_CACHE) > _MOD_CACHE_MAX:
+                _MOD_CACHE.popitem(last=False)
+
+    context[set_name] = results
+    return 0
+
+
 def mistral_moderations(args, context):
     """
     Moderate text using Mistral Moderation API.
 
-    Accepts a single string in args[0]. Stores the result in context[set_context]
-    (default: "prev"). Errors are stored in context[<set_name>_error].
+    Accepts a single string in args[0], or a list of strings to moderate in
+    one batched call per 128 inputs. Stores the result in context[set_context]
+    (default: "prev") -- the full API response for a single string, a list of
+    per-input results for list input. Errors are stored in
+    context[<set_name>_error].
 
     Optional context parameter:
         - MISTRAL_MODERATION_MODEL: override the default model (default: "mistral-moderation-latest")
+        - MISTRAL_MOD_BATCH: batch size for list input (default: 128)
 
     Args:
-        args (list): [input_text]
+        args (list): [input_text] where input_text is a string or list of strings
         context (dict): may contain 'set_context' and 'MISTRAL_API_KEY'
 
     Returns:
         int: 0 for success, -1 for failure
     """
+    import httpx
+
     set_name = context.get("set_context", "prev")
     error_key = f"{set_name}_error"
 
@@ -44,22 +174,32 @@ def mistral_moderations(args, context):
 
     input_text = args[0]
     model = context.get("MISTRAL_MODERATION_MODEL", "mistral-moderation-latest")
-    endpoint = "https://api.mistral.ai/v1/moderations"
+
+    # List input: one batched request per chunk instead of N round-trips
+    if isinstance(input_text, list):
+        return _moderate_many(input_text, model, api_key, context, set_name, error_key)
+
+    # Cache lookup
+    use_cache = context.get("MISTRAL_MOD_CACHE", True) and isinstance(input_text, str)
+    if use_cache:
+        cache_key = _mod_cache_key(model, input_text)
+        cached = _MOD_CACHE.get(cache_key)
+        if cached is not None:
+            _MOD_CACHE.move_to_end(cache_key)
+            context[set_name] = cached
+            return 0
 
     payload = {
         "input": input_text,
         "model": model
     }
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    headers = _auth_headers(api_key)
 
     # Send request
     try:
-        response = requests.post(endpoint, headers=headers, data=json.dumps(payload))
-    except requests.RequestException as e:
+        response = _client().post(_MOD_URL, headers=headers, content=orjson.dumps(payload))
+    except httpx.HTTPError as e:
         context[error_key] = f"Request failed: {e}"
         return -1
 
@@ -70,8 +210,13 @@ def mistral_moderations(args, context):
 
     # Parse response
     try:
-        result = response.json()
+        result = orjson.loads(response.content)
         context[set_name] = result
+        if use_cache:
+            _MOD_CACHE[cache_key] = result
+            _MOD_CACHE.move_to_end(cache_key)
+            while len(_MOD_CACHE) > _MOD_CACHE_MAX:
+                _MOD_CACHE.popitem(last=False)
         return 0
     except Exception as e:
         context[error_key] = f"Error parsing response: {e}"
@@ -79,21 +224,41 @@ def mistral_moderations(args, context):
 
 
 if __name__ == "__main__":
-    # Expect first argument to be the path to a JSON file containing args/context
-    if len(sys.argv) < 2:
-        print("Usage: python mistral_moderations.py <data.json>")
+    # Expect an argument with the path to a JSON (or, with --msgpack,
+    # MessagePack) file containing args/context
+    argv = sys.argv[1:]
+    use_msgpack = "--msgpack" in argv
+    if use_msgpack:
+        argv.remove("--msgpack")
+
+    if not argv:
+        print("Usage: python mistral_moderations.py [--msgpack] <data.json>")
         sys.exit(1)
 
-    data_file = Path(sys.argv[1])
+    data_file = Path(argv[0])
     if not data_file.exists():
         print(f"Error: JSON file '{data_file}' not found.")
         sys.exit(1)
 
-    # Load JSON file
-    with data_file.open("r", encoding="utf-8") as f:
+    # Load data file
+    if use_msgpack:
+        import msgpack
+        try:
+            data = msgpack.unpackb(data_file.read_bytes(), raw=False)
+        except Exception as e:
+            print(f"Error parsing {data_file}: {e}")
+            sys.exit(1)
+    else:
+        # mmap + orjson: parse straight from the page cache, skipping the
+        # Python-level utf-8 decode of the whole file
         try:
-            data = json.load(f)
-        except json.JSONDecodeError as e:
+            with data_file.open("rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    data = orjson.loads(memoryview(mm))
+                finally:
+                    mm.close()
+        except ValueError as e:  # orjson.JSONDecodeError, empty-file mmap
             print(f"Error parsing {data_file}: {e}")
             sys.exit(1)
 